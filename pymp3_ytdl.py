@@ -4,39 +4,52 @@
 """
 Downloads MP3 audio from a list of URLs (e.g., YouTube videos),
 sets metadata (title, artist), and embeds the video thumbnail as cover art.
+By default ffmpeg writes the tags and cover art in the same pass that encodes the MP3.
 Files are saved to a specified output directory.
 
 This version uses Python's logging module for output and attempts to get the
-final filepath directly from yt-dlp's info_dict after download and conversion.
-It also converts WebP thumbnails to JPEG for better compatibility.
+final filepath directly from yt-dlp's info_dict after download. Downloads and
+ffmpeg MP3 conversions run in separate thread pools so they overlap.
+ffmpeg stores cover art as JPEG/PNG. When tagging with mutagen instead, WebP
+thumbnails are embedded as-is, or converted to JPEG if CONVERT_WEBP_TO_JPEG is set.
 
 Dependencies:
 - yt-dlp: For downloading and extracting audio.
 - mutagen: For MP3 metadata manipulation.
 - requests: For downloading thumbnails.
-- Pillow: For image format conversion (e.g., WebP to JPEG).
-- ffmpeg: Must be installed and in the system PATH (for yt-dlp audio extraction).
+- requests-cache (optional): For caching thumbnails between runs.
+- Pillow: For optional image format conversion (WebP to JPEG).
+- ffmpeg: Must be installed and in the system PATH (for MP3 conversion).
 
 Usage:
-python this_script_name.py list_of_urls.txt [--loglevel DEBUG]
+python this_script_name.py list_of_urls.txt [--loglevel DEBUG] [--jobs N]
 
 Default log level is INFO. Use --loglevel DEBUG for verbose output.
 """
 
 import argparse
+import atexit
+import functools
 import io
 import logging
+import logging.handlers
 import os
-import shutil
+import queue
+import re
+import subprocess
 import sys
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from mutagen.id3 import APIC, ID3, TIT2, TPE1, ID3NoHeaderError
+from mutagen.mp4 import MP4, MP4Cover
+
+# yt-dlp, requests and Pillow are imported where they are first used: together
+# they take a few hundred milliseconds to load, which --help and a bad URL file
+# should not have to wait for.
 
-import requests
-import yt_dlp
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import APIC, ID3, ID3NoHeaderError
-from mutagen.mp3 import MP3
-from PIL import Image
-from yt_dlp.utils import sanitize_filename as ydlp_sanitize_filename
 
 # --- Configuration ---
 OUTPUT_DIRECTORY_NAME = "downloaded_music"
@@ -54,13 +67,169 @@ SANITIZE_WITH_RESTRICTED_MODE = (
     False  # Default to False for keep Thai character (not maximum safety)
 )
 
+# True: Skip URLs whose video ID already appears in an MP3 filename in the output
+#       directory (files are named "Title [id].mp3"), or in the download archive.
+# False: Always download every URL (same as the --force option)
+SKIP_EXISTING_DOWNLOADS = True
+
+# File in the output directory listing every finished item (yt-dlp's download
+# archive format, "<extractor> <id>" per line). An item is only recorded once it
+# is converted and tagged, so failed items are retried on the next run. Unlike
+# the filename check, this also detects files renamed by PERFORM_CUSTOM_RENAMING.
+DOWNLOAD_ARCHIVE_NAME = ".downloaded.txt"
+
+# Number of URLs downloaded concurrently
+MAX_WORKERS = min(8, os.cpu_count() or 4)
+
+# True: Treat MAX_WORKERS (or --jobs) as an upper bound and adapt the number of
+#       concurrent downloads to the available bandwidth: one more while the total
+#       download rate keeps improving, one fewer when it drops, and half as many
+#       when the server rate-limits us (HTTP 429/403) or requests time out
+# False: Always run MAX_WORKERS downloads concurrently
+ADAPTIVE_CONCURRENCY = True
+
+# How often (seconds) the adaptive controller measures the download rate
+ADAPTIVE_SAMPLE_SECONDS = 5
+
+# Where the last concurrency level is kept, so the next run starts from it
+CONCURRENCY_STATE_FILE = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "pymp3-ytdl",
+    "conc",
+)
+
+# Number of fragments yt-dlp downloads in parallel for a single DASH/HLS stream
+CONCURRENT_FRAGMENT_DOWNLOADS = 4
+
+# Size of the HTTP range requests yt-dlp uses for single-file downloads (bytes).
+# Chunking avoids server-side throttling of one long-running request.
+HTTP_CHUNK_SIZE = 10 * 1024 * 1024
+
+# Number of ffmpeg MP3 conversions (and tagging) run concurrently
+CONVERT_WORKERS = os.cpu_count() or 2
+
+# Maximum number of downloaded files waiting for (or in) conversion. Downloads
+# pause when it is reached, so a slow ffmpeg stage cannot fill up the disk.
+CONVERT_QUEUE_SIZE = CONVERT_WORKERS * 2
+
+# True: Keep YouTube's original audio stream (usually AAC) in an .m4a file instead of
+#       re-encoding it to MP3. Much faster, no extra quality loss; tags are written with mutagen.
+#       Audio that M4A cannot hold (e.g. Opus) is still converted to MP3.
+# False: Convert to MP3
+KEEP_NATIVE_CODEC = False
+
+# True: ffmpeg writes title, artist and cover art while converting to MP3 (single pass).
+#       Falls back to tagging with mutagen if the cover art cannot be embedded.
+# False: Convert first, then download the thumbnail and tag the MP3 with mutagen.
+EMBED_METADATA_WITH_FFMPEG = True
+
+# Only used when tagging with mutagen (ffmpeg always stores cover art as JPEG/PNG)
+# True: Re-encode WebP thumbnails to JPEG (for players that cannot show WebP cover art)
+# False: Embed the original WebP bytes as-is (smaller and skips a decode/encode per track)
+CONVERT_WEBP_TO_JPEG = False
+
+# Largest width/height (pixels) of cover art that is re-encoded. Larger thumbnails
+# (e.g. 1280x720) are downscaled, which keeps the embedded image small.
+COVER_MAX_SIZE = 600
+
+# JPEG/PNG cover art larger than this (bytes) is downscaled to COVER_MAX_SIZE
+# too (e.g. 1280x720 "maxres" thumbnails); smaller covers are embedded as-is.
+COVER_RESIZE_MIN_BYTES = 80_000
+
+# Largest thumbnail (width x height) that is decoded for re-encoding. YouTube
+# thumbnails are at most 1280x720; anything far bigger is refused instead of
+# being decoded into memory.
+THUMBNAIL_MAX_PIXELS = 4096 * 4096
+
+# Free space (bytes) reserved after the tags when mutagen or ffmpeg writes them, so
+# later tag/cover edits are written in place instead of rewriting the whole file
+TAG_PADDING_BYTES = 64 * 1024
+
+# SQLite cache for downloaded thumbnails (only used if requests-cache is installed).
+# Re-runs revalidate with ETag/Last-Modified instead of downloading the image again.
+THUMBNAIL_CACHE_NAME = ".thumb_cache"
+THUMBNAIL_CACHE_EXPIRE_SECONDS = 86400
+
+# --- HTTP Session ---
+# One shared session so thumbnail downloads reuse pooled keep-alive connections
+# (e.g., to i.ytimg.com) instead of a new TCP+TLS handshake per track.
+# requests.Session is safe to share between the worker threads for plain GETs.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Returns the shared HTTP session, creating it on first use."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            return _http_session
+
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        try:
+            import requests_cache  # Optional: HTTP caching of thumbnails across runs
+        except ImportError:
+            requests_cache = None
+
+        if requests_cache is not None:
+            session = requests_cache.CachedSession(
+                THUMBNAIL_CACHE_NAME,
+                backend="sqlite",
+                cache_control=True,
+                expire_after=THUMBNAIL_CACHE_EXPIRE_SECONDS,
+            )
+        else:
+            session = requests.Session()
+        session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=16,
+                pool_maxsize=32,
+                max_retries=Retry(total=3, backoff_factor=0.3),
+            ),
+        )
+        # Close pooled connections (and the cache database, if any) on exit
+        atexit.register(session.close)
+        _http_session = session
+        return session
+
+
+@functools.lru_cache(maxsize=None)
+def get_turbo_jpeg():
+    """Returns a TurboJPEG encoder, or None if PyTurboJPEG is not usable.
+
+    Optional: PyTurboJPEG encodes cover art with libjpeg-turbo, several times
+    faster than Pillow's JPEG encoder. TurboJPEG() fails if the shared
+    libturbojpeg library is not installed.
+    """
+    try:
+        from turbojpeg import TurboJPEG
+
+        return TurboJPEG()
+    except (ImportError, OSError, RuntimeError):
+        return None
+
+
 # --- Setup Logging ---
 # Create a logger instance
 logger = logging.getLogger(__name__)  # Using __name__ is a common practice
 
+# Background thread that writes queued log records to the console
+_log_listener: logging.handlers.QueueListener | None = None
+
 
 def setup_logging(loglevel_str: str = "INFO"):
-    """Sets up basic stream logging."""
+    """Sets up basic stream logging.
+
+    Worker threads only enqueue records (QueueHandler); a single background
+    QueueListener thread does the actual console writes, so logging never
+    blocks the download/conversion threads on stdout.
+    """
+    global _log_listener
+
     loglevel = getattr(logging, loglevel_str.upper(), logging.INFO)
     logger.setLevel(loglevel)
 
@@ -85,11 +254,20 @@ def setup_logging(loglevel_str: str = "INFO"):
 
     console_handler.setFormatter(formatter)
 
+    # Route records through a queue to the console handler
+    if _log_listener is not None:
+        _log_listener.stop()
+    else:
+        atexit.register(lambda: _log_listener.stop())  # Flush pending records on exit
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(log_queue, console_handler)
+    _log_listener.start()
+
     # Add the handler to the logger
     # Remove existing handlers to prevent duplicate messages if setup_logging is called multiple times
     if logger.hasHandlers():
         logger.handlers.clear()
-    logger.addHandler(console_handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
     # Integrate yt-dlp's logging with our logger if desired (optional, can be verbose)
     # This makes yt-dlp's own messages (like [youtube] Extracting URL...) use our logger settings.
@@ -105,291 +283,1187 @@ def setup_logging(loglevel_str: str = "INFO"):
 # --- Helper Functions ---
 def read_url_list(file_path: str) -> list[str] | None:
     """Reads a list of URLs from a text file."""
-    if not os.path.isfile(file_path):
+    try:
+        # One read and a C-level split/strip on bytes; only non-blank lines are decoded
+        with open(file_path, "rb") as f:
+            lines = f.read().splitlines()
+        urls = [line.decode("utf-8") for line in map(bytes.strip, lines) if line]
+        if not urls:
+            logger.error(
+                f"The URL file '{file_path}' is empty or contains only blank lines."
+            )
+            return None
+        return urls
+    except FileNotFoundError:
         logger.error(f"URL file not found: {file_path}")
         return None  # Return None instead of sys.exit to allow main to handle
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            urls = [line.strip() for line in f if line.strip()]
-            if not urls:
-                logger.error(
-                    f"The URL file '{file_path}' is empty or contains only blank lines."
-                )
-                return None
-            return urls
     except Exception as e:
         logger.error(f"Failed to read URL file '{file_path}': {e}")
         return None
 
 
-def apply_metadata_and_cover(
-    mp3_filepath: str, title: str, artist: str, thumbnail_url: str | None = None
-) -> None:
-    """Applies title, artist, and cover art metadata to an MP3 file."""
-    if not os.path.exists(mp3_filepath):
-        logger.error(
-            f"  (apply_metadata): MP3 file not found at '{mp3_filepath}'. Cannot apply metadata."
+# Video ID in YouTube watch/short/embed URLs and youtu.be links
+_VIDEO_ID_IN_URL_RE = re.compile(
+    r"(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})"
+)
+# Video ID at the end of an output filename produced by our outtmpl ("Title [id].mp3").
+# .m4a files are not counted: an untagged M4A download or remux has the same
+# name, so finished M4A files are only recognized through the download archive.
+_VIDEO_ID_IN_FILENAME_RE = re.compile(r"\[([0-9A-Za-z_-]+)\]\.mp3$", re.IGNORECASE)
+
+
+def extract_video_id(url: str) -> str | None:
+    """Returns the YouTube video ID contained in a URL, or None if there is none."""
+    match = _VIDEO_ID_IN_URL_RE.search(url)
+    return match.group(1) if match else None
+
+
+def list_file_names(directory: str) -> set[str]:
+    """Returns the names of all entries in a directory (one scandir)."""
+    with os.scandir(directory) as entries:
+        return {entry.name for entry in entries}
+
+
+def scan_downloaded_ids(file_names: set[str]) -> set[str]:
+    """Returns the video IDs of the MP3 files among the given file names."""
+    downloaded_ids = set()
+    for name in file_names:
+        match = _VIDEO_ID_IN_FILENAME_RE.search(name)
+        if match:
+            downloaded_ids.add(match.group(1))
+    return downloaded_ids
+
+
+def load_download_archive(archive_path: str) -> set[str]:
+    """Returns the entries of a download archive file (empty if there is none yet)."""
+    try:
+        with open(archive_path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+_archive_lock = threading.Lock()
+# Guards the set of taken file names used by the custom renaming
+_rename_lock = threading.Lock()
+
+
+def record_download(archive_path: str, info_dict: dict) -> None:
+    """Appends a finished item to the download archive file."""
+    from yt_dlp.utils import make_archive_id
+
+    archive_id = make_archive_id(info_dict["extractor_key"], info_dict["id"])
+    try:
+        with _archive_lock, open(archive_path, "a", encoding="utf-8") as f:
+            f.write(archive_id + "\n")
+    except OSError as e:
+        logger.warning(
+            f"  Could not record '{archive_id}' in the download archive: {e}"
         )
-        return
+
+
+@functools.lru_cache(maxsize=4096)
+def sanitize_filename_cached(title: str, restricted: bool) -> str:
+    """Memoized yt-dlp sanitize_filename, for titles that repeat within one run."""
+    from yt_dlp.utils import sanitize_filename
+
+    return sanitize_filename(title, restricted=restricted)
+
+
+def reserve_tag_padding(info) -> int:
+    """mutagen padding callback that makes tag edits happen in place.
+
+    While the new tag fits into the existing padding, that padding is kept, so
+    only the tag is rewritten. Only when the tag outgrows it (or there was no
+    tag yet) is the audio payload shifted once, reserving TAG_PADDING_BYTES of
+    free space for later edits.
+    """
+    return info.padding if info.padding >= 0 else TAG_PADDING_BYTES
+
+
+def fetch_cover_image(thumbnail_url: str, convert_webp: bool) -> tuple[bytes, str]:
+    """Downloads a thumbnail and returns (image_data, mime_type).
+
+    If convert_webp is True, WebP images are re-encoded to JPEG; the image is
+    then decoded straight from the response stream instead of being buffered
+    first. Raises requests.RequestException if the download fails, or the
+    Pillow error if the conversion fails.
+    """
+    from PIL import features
+
+    with get_http_session().get(thumbnail_url, timeout=15, stream=True) as response:
+        response.raise_for_status()
+        original_mime_type = response.headers.get("Content-Type", "image/jpeg").lower()
+        logger.debug("  Original thumbnail MIME type: %s", original_mime_type)
+
+        if not convert_webp or original_mime_type != "image/webp":
+            return _shrink_cover(response.content, original_mime_type)
+        if not features.check("webp"):
+            logger.warning(
+                "  Pillow was built without WebP support. Trying to embed original WebP."
+            )
+            return response.content, original_mime_type
+
+        response.raw.decode_content = True
+        return _encode_cover_as_jpeg(response.raw), "image/jpeg"
+
+
+# MIME types of the thumbnail files yt-dlp writes, by file extension
+_COVER_MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+
+
+def read_cover_image(thumbnail_path: str, convert_webp: bool) -> tuple[bytes, str]:
+    """Reads a thumbnail saved by yt-dlp, deletes it, and returns (image_data, mime_type).
+
+    Like fetch_cover_image(), but without a second download of the thumbnail.
+    If convert_webp is True, WebP images are re-encoded to JPEG.
+    """
+    from PIL import features
+
     try:
-        logger.debug(f"  Attempting to apply metadata to: {mp3_filepath}")
+        mime_type = _COVER_MIME_TYPES.get(
+            os.path.splitext(thumbnail_path)[1].lower(), "image/jpeg"
+        )
+        logger.debug("  Using thumbnail saved by yt-dlp: %s", thumbnail_path)
+        if convert_webp and mime_type == "image/webp" and features.check("webp"):
+            with open(thumbnail_path, "rb") as f:
+                return _encode_cover_as_jpeg(f), "image/jpeg"
+        with open(thumbnail_path, "rb") as f:
+            return _shrink_cover(f.read(), mime_type)
+    finally:
         try:
-            audio = EasyID3(mp3_filepath)
-        except ID3NoHeaderError:
-            logger.debug(f"  No ID3 header in {mp3_filepath}, creating one.")
-            audio_mp3 = MP3(mp3_filepath)
-            if audio_mp3.tags is None:
-                audio_mp3.add_tags()
-                audio_mp3.save()
-            audio = EasyID3(mp3_filepath)
-
-        audio["title"] = title
-        audio["artist"] = artist
-        audio.save()
-        logger.debug(
-            f"  Set metadata: title='{title}', artist='{artist}' for '{os.path.basename(mp3_filepath)}'"
+            os.remove(thumbnail_path)
+        except OSError:
+            pass
+
+
+def _shrink_cover(image_data: bytes, mime_type: str) -> tuple[bytes, str]:
+    """Downscales a large JPEG/PNG cover to COVER_MAX_SIZE.
+
+    Covers up to COVER_RESIZE_MIN_BYTES, covers that already fit, and other
+    formats are returned unchanged.
+    """
+    if (
+        mime_type not in ("image/jpeg", "image/png")
+        or len(image_data) <= COVER_RESIZE_MIN_BYTES
+    ):
+        return image_data, mime_type
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_data)) as img:
+        if max(img.size) <= COVER_MAX_SIZE:
+            return image_data, mime_type
+    return _encode_cover_as_jpeg(io.BytesIO(image_data)), "image/jpeg"
+
+
+def _encode_cover_as_jpeg(fp) -> bytes:
+    """Re-encodes an image from a file object as JPEG, at most COVER_MAX_SIZE per side."""
+    from PIL import Image
+
+    logger.debug("  Re-encoding thumbnail as JPEG...")
+    img = Image.open(fp)  # Only parses the header; pixels are decoded on first use
+    if img.width * img.height > THUMBNAIL_MAX_PIXELS:
+        raise ValueError(
+            f"thumbnail is too large to convert ({img.width}x{img.height})"
         )
+    # JPEG sources are decoded at a reduced scale (no-op for other formats)
+    img.draft("RGB", (COVER_MAX_SIZE, COVER_MAX_SIZE))
+    # Downscale before the mode conversion so the RGB copy is already small
+    img.thumbnail((COVER_MAX_SIZE, COVER_MAX_SIZE), Image.Resampling.LANCZOS)
+    if img.mode == "RGBA" or img.mode == "P" or img.mode == "LA":
+        logger.debug("  Image mode is %s, converting to RGB for JPEG.", img.mode)
+        img = img.convert("RGB")
 
-        if thumbnail_url:
-            logger.debug(f"  Processing thumbnail from URL: {thumbnail_url}")
+    turbo_jpeg = get_turbo_jpeg()
+    if turbo_jpeg is not None and img.mode == "RGB":
+        import numpy
+        from turbojpeg import TJPF_RGB
+
+        image_data = turbo_jpeg.encode(
+            numpy.asarray(img), quality=80, pixel_format=TJPF_RGB
+        )
+        logger.debug("  Thumbnail re-encoded as JPEG with libjpeg-turbo.")
+        return image_data
+
+    with io.BytesIO() as output_buffer:
+        img.save(
+            output_buffer,
+            format="JPEG",
+            quality=80,
+            optimize=True,
+            progressive=False,
+        )
+        image_data = output_buffer.getvalue()
+    logger.debug("  Thumbnail re-encoded as JPEG.")
+    return image_data
+
+
+def apply_metadata_and_cover(
+    audio_filepath: str,
+    title: str,
+    artist: str,
+    thumbnail_url: str | None = None,
+    cover_future: Future | None = None,
+) -> bool:
+    """Applies title, artist, and cover art metadata to an MP3 (ID3) or M4A file.
+
+    All tags are set in memory and written back with a single save. If given,
+    cover_future is a prefetched fetch_cover_image() or read_cover_image()
+    result and is used instead of downloading the thumbnail here.
+
+    Returns True if the tags were saved. A missing cover does not count as failure.
+    """
+    import requests
+
+    extension = os.path.splitext(audio_filepath)[1].lower()
+    if extension not in (".mp3", ".m4a"):
+        # Never put an ID3 header in front of e.g. a WebM file
+        logger.error(
+            f"  Cannot set metadata for '{os.path.basename(audio_filepath)}': unsupported file type."
+        )
+        return False
+    # No exists() check first: a missing file fails the open() below and is logged there
+    is_m4a = extension == ".m4a"
+    try:
+        cover = None
+        if thumbnail_url or cover_future is not None:
+            logger.debug("  Processing thumbnail from URL: %s", thumbnail_url)
             try:
-                response = requests.get(thumbnail_url, timeout=15)
-                response.raise_for_status()
-                image_data = response.content
-                original_mime_type = response.headers.get(
-                    "Content-Type", "image/jpeg"
-                ).lower()
-                logger.debug(f"  Original thumbnail MIME type: {original_mime_type}")
-
-                final_image_data = image_data
-                final_mime_type = original_mime_type
-
-                if original_mime_type == "image/webp":
-                    logger.debug("  Attempting to convert WEBP thumbnail to JPEG...")
-                    try:
-                        img = Image.open(io.BytesIO(image_data))
-                        if img.mode == "RGBA" or img.mode == "P" or img.mode == "LA":
-                            logger.debug(
-                                f"  Image mode is {img.mode}, converting to RGB for JPEG."
-                            )
-                            img = img.convert("RGB")
-
-                        output_buffer = io.BytesIO()
-                        img.save(output_buffer, format="JPEG", quality=90)
-                        final_image_data = output_buffer.getvalue()
-                        final_mime_type = "image/jpeg"
-                        logger.debug("  WEBP successfully converted to JPEG.")
-                    except Exception as e_conv:
-                        logger.warning(
-                            f"  Failed to convert WEBP to JPEG: {e_conv}. Trying to embed original WebP."
+                if cover_future is not None:
+                    cover = cover_future.result()
+                else:
+                    # MP4 cover art must be JPEG or PNG, so WebP is always converted for M4A
+                    cover = fetch_cover_image(
+                        thumbnail_url, convert_webp=CONVERT_WEBP_TO_JPEG or is_m4a
+                    )
+                if is_m4a and cover[1] not in ("image/jpeg", "image/png"):
+                    raise ValueError(
+                        f"{cover[1]} cover art is not supported in M4A files"
+                    )
+            except requests.RequestException as e_req:
+                cover = None
+                logger.warning(
+                    f"  Could not download thumbnail from {thumbnail_url}: {e_req}"
+                )
+            except Exception as e_cover:
+                cover = None
+                logger.warning(
+                    f"  Could not embed cover art for '{os.path.basename(audio_filepath)}': {e_cover}"
+                )
+
+        logger.debug("  Attempting to apply metadata to: %s", audio_filepath)
+        # The cover is ready before the file is opened, and the same handle is used
+        # to parse the existing tags and to write the new ones back. mutagen reads
+        # the old tag from the current position on save, hence the seek(0) calls.
+        with open(audio_filepath, "r+b") as audio_file:
+            if is_m4a:
+                audio = MP4(audio_file)
+                if audio.tags is None:
+                    audio.add_tags()
+                audio.tags["\xa9nam"] = [title]
+                audio.tags["\xa9ART"] = [artist]
+                if cover is not None:
+                    audio.tags["covr"] = [
+                        MP4Cover(
+                            cover[0],
+                            imageformat=(
+                                MP4Cover.FORMAT_PNG
+                                if cover[1] == "image/png"
+                                else MP4Cover.FORMAT_JPEG
+                            ),
                         )
+                    ]
+                audio_file.seek(0)
+                audio.save(audio_file, padding=reserve_tag_padding)
+            else:
+                try:
+                    tags = ID3(audio_file)
+                except ID3NoHeaderError:
+                    logger.debug("  No ID3 header in %s, creating one.", audio_filepath)
+                    tags = ID3()
 
-                audio_full = ID3(mp3_filepath)
-                audio_full.delall("APIC")
-                audio_full.add(
-                    APIC(
-                        encoding=3,
-                        mime=final_mime_type,
-                        type=3,
-                        desc="Cover",
-                        data=final_image_data,
+                tags.delall("TIT2")
+                tags.add(TIT2(encoding=3, text=title))
+                tags.delall("TPE1")
+                tags.add(TPE1(encoding=3, text=artist))
+                if cover is not None:
+                    tags.delall("APIC")
+                    tags.add(
+                        APIC(
+                            encoding=3,
+                            mime=cover[1],
+                            type=3,
+                            desc="Cover",
+                            data=cover[0],
+                        )
                     )
+                # Convert v2.4-only frames in memory; save() does not do this itself
+                tags.update_to_v23()
+                audio_file.seek(0)
+                tags.save(audio_file, v2_version=3, padding=reserve_tag_padding)
+        logger.debug(
+            "  Set metadata: title='%s', artist='%s'%s for '%s'",
+            title,
+            artist,
+            f" and cover art ({cover[1]})" if cover is not None else "",
+            os.path.basename(audio_filepath),
+        )
+        return True
+    except Exception as e:
+        logger.error(
+            f"  Failed to set metadata for '{os.path.basename(audio_filepath)}': {e}",
+            exc_info=True if logger.isEnabledFor(logging.DEBUG) else False,
+        )
+    return False
+
+
+# --- Adaptive Concurrency ---
+class AdaptiveConcurrency:
+    """AIMD limit on the number of downloads running at the same time.
+
+    A monitor thread samples the total download rate every
+    ADAPTIVE_SAMPLE_SECONDS. While all allowed downloads are busy, the limit is
+    raised by one to probe for more bandwidth; the probe is kept if the rate
+    improved by more than 5% and undone otherwise. A rate drop of more than 10%
+    lowers the limit by one, and throttled() halves it (at most once per
+    sample, since yt-dlp reports every retry). The limit never exceeds maximum,
+    the size of the download pool.
+    """
+
+    def __init__(self, initial: int, maximum: int) -> None:
+        self.maximum = maximum
+        self.limit = max(1, min(initial, maximum))
+        self._active = 0
+        self._bytes = 0
+        self._file_bytes: dict[str, int] = {}
+        self._last_rate: float | None = None
+        self._probing = False
+        self._last_throttled = float("-inf")
+        self._cancelled = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._monitor = threading.Thread(
+            target=self._run_monitor, name="concurrency-monitor", daemon=True
+        )
+        self._monitor.start()
+
+    def acquire(self) -> None:
+        """Blocks until a download may start (or cancel() was called)."""
+        with self._cond:
+            while self._active >= self.limit and not self._cancelled:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self) -> None:
+        """Marks a download as finished."""
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def progress_hook(self, d: dict) -> None:
+        """yt-dlp progress hook that counts the bytes downloaded by all threads."""
+        filename = d.get("filename")
+        downloaded = d.get("downloaded_bytes")
+        if filename is None or downloaded is None:
+            return
+        with self._cond:
+            self._bytes += max(0, downloaded - self._file_bytes.get(filename, 0))
+            if d.get("status") == "downloading":
+                self._file_bytes[filename] = downloaded
+            else:
+                self._file_bytes.pop(filename, None)
+
+    def throttled(self) -> None:
+        """Multiplicative decrease after a request was rate-limited or timed out."""
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_throttled < ADAPTIVE_SAMPLE_SECONDS:
+                return
+            self._last_throttled = now
+            new_limit = max(1, self.limit // 2)
+            if new_limit < self.limit:
+                logger.info(
+                    f"  Downloads are rate limited or timing out, reducing concurrent downloads to {new_limit}."
                 )
-                audio_full.save(v2_version=3)
+            self.limit = new_limit
+            self._last_rate = None
+            self._probing = False
+
+    def cancel(self) -> None:
+        """Wakes up every thread waiting in acquire(), now and later."""
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Stops the monitor thread."""
+        self._stop.set()
+        self._monitor.join()
+
+    def _run_monitor(self) -> None:
+        while not self._stop.wait(ADAPTIVE_SAMPLE_SECONDS):
+            with self._cond:
+                rate = self._bytes / ADAPTIVE_SAMPLE_SECONDS
+                self._bytes = 0
+                last_rate, self._last_rate = self._last_rate, rate
+                # Only a saturated limit says anything about the bandwidth
+                if last_rate is None or self._active < self.limit:
+                    continue
+                if self._probing and rate <= last_rate * 1.05:
+                    # The extra download did not help: undo the probe
+                    self.limit -= 1
+                    self._probing = False
+                elif rate < last_rate * 0.9 and self.limit > 1:
+                    self.limit -= 1
+                elif self.limit < self.maximum:
+                    self.limit += 1
+                    self._probing = True
+                    self._cond.notify()
+                else:
+                    continue
                 logger.debug(
-                    f"  Embedded cover art (mime: {final_mime_type}) into '{os.path.basename(mp3_filepath)}'"
+                    "  Download rate %.0f KiB/s, concurrent downloads now %s.",
+                    rate / 1024,
+                    self.limit,
                 )
-            except requests.RequestException as e_req:
-                logger.warning(
-                    f"  Could not download thumbnail from {thumbnail_url}: {e_req}"
+
+
+class _YtdlpLogger:
+    """Forwards yt-dlp's messages to our logger and reports rate limiting."""
+
+    # Retried errors only show up in debug messages ("Got error: ... Retrying")
+    _THROTTLE_MARKERS = ("HTTP Error 429", "HTTP Error 403", "timed out")
+    # Only error and retry lines are checked: other messages (e.g. "Destination:
+    # <title> [id].webm") may contain a marker as part of a title
+    _ERROR_LINE_RE = re.compile(
+        r"(?:\x1b\[[0-9;]*m)*(?:ERROR:|(?:\[download\] )?Got error:)"
+    )
+
+    def __init__(self, concurrency: AdaptiveConcurrency) -> None:
+        self.concurrency = concurrency
+
+    def debug(self, msg: str) -> None:
+        logger.debug(msg)
+        self._check_throttled(msg)
+
+    def info(self, msg: str) -> None:
+        logger.info(msg)
+
+    def warning(self, msg: str) -> None:
+        logger.warning(msg)
+        self._check_throttled(msg)
+
+    def error(self, msg: str) -> None:
+        logger.error(msg)
+        self._check_throttled(msg)
+
+    def _check_throttled(self, msg: str) -> None:
+        if self._ERROR_LINE_RE.match(msg.lstrip("\r ")) and any(
+            marker in msg for marker in self._THROTTLE_MARKERS
+        ):
+            self.concurrency.throttled()
+
+
+def load_concurrency_state(default: int) -> int:
+    """Returns the concurrency level saved by the previous run, or default."""
+    try:
+        with open(CONCURRENCY_STATE_FILE, encoding="utf-8") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return default
+
+
+def save_concurrency_state(limit: int) -> None:
+    """Saves the concurrency level for the next run."""
+    try:
+        os.makedirs(os.path.dirname(CONCURRENCY_STATE_FILE), exist_ok=True)
+        with open(CONCURRENCY_STATE_FILE, "w", encoding="utf-8") as f:
+            f.write(str(limit))
+    except OSError as e:
+        logger.debug(
+            "Could not save concurrency level to %s: %s", CONCURRENCY_STATE_FILE, e
+        )
+
+
+# --- Pipeline Stages ---
+# Per-thread state of the download pool (holds the worker's YoutubeDL instance)
+_download_worker = threading.local()
+
+
+def _init_download_worker(ydl_opts: dict, ydl_instances: list) -> None:
+    """Creates the YoutubeDL instance reused by this download thread for all its URLs."""
+    # Each thread gets its own instance; YoutubeDL is not thread-safe. The options
+    # are copied once per thread (not per URL) because YoutubeDL keeps and
+    # modifies the dict it is given.
+    import yt_dlp
+
+    _download_worker.ydl = yt_dlp.YoutubeDL(ydl_opts.copy())
+    ydl_instances.append(_download_worker.ydl)
+
+
+def _download_audio(
+    url: str,
+    idx: int,
+    total: int,
+    convert_slots: threading.Semaphore,
+    stop: threading.Event,
+    concurrency: AdaptiveConcurrency | None = None,
+) -> dict | None:
+    """Download stage: fetches the raw audio stream for a single URL.
+
+    Waits for a free slot in convert_slots first. The slot is released here if
+    the download fails, otherwise once the file has been converted. Nothing is
+    downloaded once stop is set. If given, concurrency additionally limits how
+    many downloads run at once.
+
+    Returns yt-dlp's info_dict with the downloaded file path stored under
+    "filepath", an empty dict if the item is in the download archive, or None
+    if the download failed.
+    """
+    convert_slots.acquire()
+    info_dict = None
+    try:
+        if stop.is_set():
+            return None
+        if concurrency is None:
+            info_dict = _download_audio_into_slot(url, idx, total)
+        else:
+            concurrency.acquire()
+            try:
+                # The run may have been interrupted while waiting
+                if stop.is_set():
+                    return None
+                info_dict = _download_audio_into_slot(url, idx, total)
+            finally:
+                concurrency.release()
+        return info_dict
+    finally:
+        if not info_dict:
+            convert_slots.release()
+
+
+def _download_audio_into_slot(url: str, idx: int, total: int) -> dict | None:
+    """Runs the yt-dlp download for _download_audio()."""
+    import yt_dlp
+
+    logger.info(f"[{idx}/{total}] Processing URL: {url}")
+
+    try:
+        logger.debug("  Extracting info and downloading for URL: %s", url)
+        final_info_dict = _download_worker.ydl.extract_info(url, download=True)
+
+        if not final_info_dict:
+            logger.warning(
+                f"  yt-dlp's extract_info (with download) did not return sufficient information for {url}."
+            )
+            return None
+
+        raw_audio_path = final_info_dict.get("filepath")
+        if not raw_audio_path and final_info_dict.get("requested_downloads"):
+            for dl_info in final_info_dict["requested_downloads"]:
+                if dl_info.get("filepath"):
+                    raw_audio_path = dl_info["filepath"]
+                    logger.debug(
+                        "  Found audio path in requested_downloads: %s", raw_audio_path
+                    )
+                    break
+
+        if not raw_audio_path or not os.path.exists(raw_audio_path):
+            # yt-dlp writes the thumbnail before downloading the audio
+            _remove_written_thumbnail(final_info_dict)
+            logger.error(
+                f"  Could not reliably locate the downloaded audio file from yt-dlp's output for URL {url}."
+            )
+            logger.debug(
+                "    Final info dict from yt-dlp was: filepath='%s', requested_downloads='%s'",
+                final_info_dict.get("filepath", "N/A"),
+                final_info_dict.get("requested_downloads", "N/A"),
+            )
+            return None
+
+        if KEEP_NATIVE_CODEC and not _keeps_native_codec(raw_audio_path):
+            # A failed remux to M4A leaves its (empty) output file behind
+            try:
+                os.remove(os.path.splitext(raw_audio_path)[0] + ".m4a")
+            except OSError:
+                pass
+
+        logger.debug("  Download finished: '%s'", os.path.basename(raw_audio_path))
+        final_info_dict["filepath"] = raw_audio_path
+        return final_info_dict
+
+    except yt_dlp.utils.ExistingVideoReached:
+        # Raised for archive hits (break_on_existing) that the URL check in
+        # download_mp3_from_urls() could not catch, e.g. for other sites or
+        # a URL listed twice
+        logger.info("  Already downloaded, skipping.")
+        return {}
+    except yt_dlp.utils.DownloadCancelled:
+        logger.debug("  Download cancelled: %s", url)
+    except yt_dlp.utils.DownloadError as e_dl:
+        logger.error(f"  DownloadError during processing {url}: {e_dl}")
+    except Exception as e:
+        logger.error(
+            f"  An unexpected error occurred while processing {url}: {e}",
+            exc_info=True if logger.isEnabledFor(logging.DEBUG) else False,
+        )
+    return None
+
+
+def _cancel_if_stopped(stop: threading.Event, d: dict) -> None:
+    """yt-dlp progress hook that aborts a running download once stop is set."""
+    if stop.is_set():
+        from yt_dlp.utils import DownloadCancelled
+
+        _remove_written_thumbnail(d["info_dict"])
+        raise DownloadCancelled("Interrupted")
+
+
+def _find_written_thumbnail(info_dict: dict) -> str | None:
+    """Returns the path of the thumbnail yt-dlp saved for this item, if any."""
+    for thumbnail in reversed(info_dict.get("thumbnails") or []):
+        thumbnail_path = thumbnail.get("filepath")
+        if thumbnail_path and os.path.exists(thumbnail_path):
+            return thumbnail_path
+    return None
+
+
+def _remove_written_thumbnail(info_dict: dict) -> None:
+    """Deletes the thumbnail yt-dlp saved for an item that will not be converted."""
+    thumbnail_path = _find_written_thumbnail(info_dict)
+    if thumbnail_path:
+        try:
+            os.remove(thumbnail_path)
+        except OSError:
+            pass
+
+
+def _convert_to_mp3(
+    raw_audio_path: str,
+    title: str | None = None,
+    artist: str | None = None,
+    cover_path: str | None = None,
+    mp3_filepath: str | None = None,
+) -> str:
+    """Transcodes a downloaded audio file to MP3 with ffmpeg and removes the source.
+
+    If given, title and artist are written as ID3v2.3 tags and cover_path is
+    embedded as cover art in the same ffmpeg pass. The MP3 is written to
+    mp3_filepath, or next to the source if that is None. ffmpeg writes to a
+    temporary ".part" file first, so a failed or interrupted conversion never
+    leaves a file that later runs would take as finished.
+
+    Returns the path of the resulting MP3 file. Raises subprocess.CalledProcessError
+    (or OSError if ffmpeg is missing) on failure.
+    """
+    if mp3_filepath is None:
+        mp3_filepath = os.path.splitext(raw_audio_path)[0] + ".mp3"
+    if raw_audio_path.lower().endswith(".mp3"):
+        logger.debug("  Source is already MP3, skipping transcode.")
+        return raw_audio_path
+    temp_filepath = mp3_filepath + ".part"
+
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-i", raw_audio_path]
+    if cover_path:
+        command += ["-i", cover_path, "-map", "0:a", "-map", "1:v"]
+        # The MP3 muxer only reliably stores JPEG/PNG cover art, so anything
+        # else (e.g. WebP) is re-encoded to JPEG, as are large JPEG/PNG covers.
+        if (
+            cover_path.lower().endswith((".jpg", ".jpeg", ".png"))
+            and os.path.getsize(cover_path) <= COVER_RESIZE_MIN_BYTES
+        ):
+            command += ["-codec:v", "copy"]
+        else:
+            command += [
+                "-vf",
+                f"scale=w='min({COVER_MAX_SIZE},iw)':h='min({COVER_MAX_SIZE},ih)'"
+                ":force_original_aspect_ratio=decrease",
+                "-codec:v",
+                "mjpeg",
+                "-q:v",
+                "2",
+            ]
+        command += [
+            "-metadata:s:v",
+            "title=Album cover",
+            "-metadata:s:v",
+            "comment=Cover (front)",
+        ]
+    else:
+        command += ["-map", "0:a"]
+    command += ["-codec:a", "libmp3lame", "-b:a", "192k"]
+    if title is not None:
+        command += ["-metadata", f"title={title}"]
+    if artist is not None:
+        command += ["-metadata", f"artist={artist}"]
+    command += [
+        "-id3v2_version",
+        "3",
+        # Lets a later mutagen edit (e.g. adding the cover) fit into the tag
+        "-metadata_header_padding",
+        str(TAG_PADDING_BYTES),
+        # The format cannot be guessed from the ".part" extension
+        "-f",
+        "mp3",
+        temp_filepath,
+    ]
+
+    logger.debug("  Converting '%s' to MP3...", os.path.basename(raw_audio_path))
+    try:
+        subprocess.run(
+            command,
+            check=True,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+        )
+        os.replace(temp_filepath, mp3_filepath)
+    except BaseException:
+        try:
+            os.remove(temp_filepath)
+        except OSError:
+            pass
+        raise
+    os.remove(raw_audio_path)  # Equivalent of yt-dlp's keepvideo=False
+    return mp3_filepath
+
+
+def _keeps_native_codec(raw_audio_path: str) -> bool:
+    """True if the downloaded file is kept as-is instead of being converted to MP3.
+
+    With KEEP_NATIVE_CODEC only M4A files are kept; anything yt-dlp could not
+    remux to M4A (e.g. Opus audio) is converted to MP3 after all.
+    """
+    return KEEP_NATIVE_CODEC and raw_audio_path.lower().endswith(".m4a")
+
+
+def _tags_with_ffmpeg(raw_audio_path: str) -> bool:
+    """True if tags and cover art are written by ffmpeg during the MP3 conversion."""
+    return (
+        EMBED_METADATA_WITH_FFMPEG
+        and not _keeps_native_codec(raw_audio_path)
+        and not raw_audio_path.lower().endswith(".mp3")
+    )
+
+
+def _prefetch_cover(
+    info_dict: dict, thumbnail_pool: ThreadPoolExecutor
+) -> Future | None:
+    """Starts loading the cover art that mutagen will embed after conversion.
+
+    This lets the thumbnail loading overlap with the ffmpeg conversion. The
+    thumbnail yt-dlp saved next to the audio is used if present (and removed
+    once read); otherwise it is downloaded from the thumbnail URL. When ffmpeg
+    tags the MP3, this is only needed if yt-dlp could not save the thumbnail.
+    Returns None if the item has no thumbnail or ffmpeg embeds the cover itself.
+    """
+    # M4A files cannot hold WebP cover art
+    convert_webp = CONVERT_WEBP_TO_JPEG or _keeps_native_codec(info_dict["filepath"])
+    thumbnail_path = _find_written_thumbnail(info_dict)
+    if thumbnail_path:
+        if _tags_with_ffmpeg(info_dict["filepath"]):
+            return None
+        return thumbnail_pool.submit(read_cover_image, thumbnail_path, convert_webp)
+    thumbnail_url = info_dict.get("thumbnail")
+    if not thumbnail_url:
+        return None
+    logger.debug("  Prefetching thumbnail: %s", thumbnail_url)
+    return thumbnail_pool.submit(
+        fetch_cover_image, thumbnail_url, convert_webp=convert_webp
+    )
+
+
+def _reserve_custom_path(
+    audio_path: str,
+    extension: str,
+    title: str,
+    sanitize_title: Callable[[str], str],
+    taken_names: set[str],
+) -> str | None:
+    """Reserves the name sanitize_title(title) + extension in audio_path's directory.
+
+    The name is added to taken_names, so other threads cannot claim it too.
+    Returns the reserved path, or None if the name is already taken.
+    """
+    desired_filename = sanitize_title(title) + extension
+    # Casefolded, so case-insensitive filesystems cannot be overwritten
+    desired_key = desired_filename.casefold()
+    with _rename_lock:
+        if desired_key in taken_names:
+            logger.warning(
+                f"  (Rename): Target file '{desired_filename}' already exists. Not renaming."
+            )
+            return None
+        taken_names.add(desired_key)
+    return os.path.join(os.path.dirname(audio_path), desired_filename)
+
+
+def _release_custom_path(custom_path: str | None, taken_names: set[str]) -> None:
+    """Frees a name reserved by _reserve_custom_path() that ended up unused."""
+    if custom_path is not None:
+        with _rename_lock:
+            taken_names.discard(os.path.basename(custom_path).casefold())
+
+
+def _convert_and_tag(
+    url: str,
+    info_dict: dict,
+    cover_future: Future | None = None,
+    archive_path: str | None = None,
+    sanitize_title: Callable[[str], str] | None = None,
+    taken_names: set[str] | None = None,
+) -> bool:
+    """Postprocess stage: converts a downloaded file to MP3, renames and tags it.
+
+    With KEEP_NATIVE_CODEC the (already remuxed) M4A file is kept as-is; other
+    files are still converted.
+    cover_future is the prefetched cover art from _prefetch_cover(), if any.
+    Once the file is tagged, the item is recorded in archive_path (if given).
+    If sanitize_title is given, the file is named sanitize_title(title) unless
+    that name is in taken_names, the casefolded names of the files in the output
+    directory (shared between threads and updated here). Converted files are
+    written under that name directly; others are renamed.
+
+    Returns True on success.
+    """
+    raw_audio_path = info_dict["filepath"]
+
+    title_for_metadata = (
+        info_dict.get("track") or info_dict.get("title", "Unknown Title")
+    ).strip() or "Unknown Title"
+    artist_for_metadata = (
+        info_dict.get("artist") or info_dict.get("uploader", "Unknown Artist")
+    ).strip() or "Unknown Artist"
+    thumbnail_url = info_dict.get("thumbnail")
+    logger.debug(
+        "  Metadata extracted: Title='%s', Artist='%s', Thumbnail='%s'",
+        title_for_metadata,
+        artist_for_metadata,
+        thumbnail_url is not None,
+    )
+
+    keep_native = _keeps_native_codec(raw_audio_path)
+    if KEEP_NATIVE_CODEC and not keep_native:
+        logger.warning(
+            f"  '{os.path.basename(raw_audio_path)}' could not be kept as M4A, converting to MP3 instead."
+        )
+    embed_with_ffmpeg = _tags_with_ffmpeg(raw_audio_path)
+    # Otherwise the thumbnail yt-dlp wrote is read (and removed) by _prefetch_cover()
+    cover_path = _find_written_thumbnail(info_dict) if embed_with_ffmpeg else None
+    cover_embedded = False
+
+    custom_path = None
+    if sanitize_title is not None:
+        logger.debug(
+            "  Attempting custom renaming for: %s", os.path.basename(raw_audio_path)
+        )
+        if taken_names is None:
+            taken_names = {
+                name.casefold()
+                for name in list_file_names(os.path.dirname(raw_audio_path) or ".")
+            }
+        extension = ".m4a" if keep_native else ".mp3"
+        custom_path = _reserve_custom_path(
+            raw_audio_path, extension, title_for_metadata, sanitize_title, taken_names
+        )
+
+    try:
+        if keep_native:
+            # yt-dlp already remuxed the original audio stream into an .m4a file
+            downloaded_audio_path = raw_audio_path
+        elif embed_with_ffmpeg:
+            try:
+                downloaded_audio_path = _convert_to_mp3(
+                    raw_audio_path,
+                    title_for_metadata,
+                    artist_for_metadata,
+                    cover_path,
+                    custom_path,
                 )
-            except Exception as e_cover:
+                cover_embedded = cover_path is not None
+            except subprocess.CalledProcessError as e_ff:
+                if cover_path is None:
+                    raise
                 logger.warning(
-                    f"  Could not embed cover art for '{os.path.basename(mp3_filepath)}': {e_cover}"
+                    f"  ffmpeg could not embed the cover art ({e_ff.stderr.decode('utf-8', 'replace').strip()}). "
+                    "Converting without it."
+                )
+                downloaded_audio_path = _convert_to_mp3(
+                    raw_audio_path,
+                    title_for_metadata,
+                    artist_for_metadata,
+                    mp3_filepath=custom_path,
+                )
+        else:
+            downloaded_audio_path = _convert_to_mp3(
+                raw_audio_path, mp3_filepath=custom_path
+            )
+    except subprocess.CalledProcessError as e_ff:
+        _release_custom_path(custom_path, taken_names)
+        logger.error(
+            f"  ffmpeg failed to convert '{os.path.basename(raw_audio_path)}' for {url}: "
+            f"{e_ff.stderr.decode('utf-8', 'replace').strip()}"
+        )
+        return False
+    except OSError as e_ff:
+        _release_custom_path(custom_path, taken_names)
+        logger.error(f"  Could not run ffmpeg for {url}: {e_ff}")
+        return False
+    finally:
+        if cover_path:
+            try:
+                os.remove(cover_path)
+            except OSError:
+                pass
+
+    try:
+        logger.info(
+            f"  Download and conversion successful. Final file: '{os.path.basename(downloaded_audio_path)}'"
+        )
+
+        final_path_for_metadata = downloaded_audio_path
+        if custom_path is not None and downloaded_audio_path != custom_path:
+            # Only kept M4A files and MP3 sources get here; converted files
+            # were already written under the custom name
+            try:
+                logger.info(
+                    f"  Renaming '{os.path.basename(downloaded_audio_path)}' to '{os.path.basename(custom_path)}'"
                 )
+                # Same directory, so always a single atomic rename(2)
+                os.replace(downloaded_audio_path, custom_path)
+                final_path_for_metadata = custom_path
+            except OSError as e_rename:
+                _release_custom_path(custom_path, taken_names)
+                logger.error(f"  (Rename): Could not rename file: {e_rename}.")
+        elif sanitize_title is None:
+            logger.debug(
+                "  Skipping custom renaming. Using filename from yt-dlp: '%s'",
+                os.path.basename(downloaded_audio_path),
+            )
+
+        if not embed_with_ffmpeg or (
+            not cover_embedded and (thumbnail_url or cover_future is not None)
+        ):
+            tagged = apply_metadata_and_cover(
+                final_path_for_metadata,
+                title_for_metadata,
+                artist_for_metadata,
+                thumbnail_url,
+                cover_future,
+            )
+        else:
+            logger.debug("  Metadata was written by ffmpeg during conversion.")
+            tagged = True
+        if tagged and archive_path:
+            record_download(archive_path, info_dict)
+        return True
+
     except Exception as e:
         logger.error(
-            f"  Failed to set metadata for '{os.path.basename(mp3_filepath)}': {e}",
+            f"  An unexpected error occurred while processing {url}: {e}",
             exc_info=True if logger.isEnabledFor(logging.DEBUG) else False,
         )
+    return False
 
 
 # --- Main Download Function ---
 def download_mp3_from_urls(
-    urls: list[str], output_dir: str = OUTPUT_DIRECTORY_NAME
+    urls: list[str],
+    output_dir: str = OUTPUT_DIRECTORY_NAME,
+    max_workers: int = MAX_WORKERS,
+    force: bool = False,
+    concurrent_fragments: int = CONCURRENT_FRAGMENT_DOWNLOADS,
 ) -> None:
-    """Downloads MP3s, applies metadata, using Python's logging."""
-    if not os.path.exists(output_dir):
-        try:
-            os.makedirs(output_dir)
-            logger.info(f"Created output directory: {output_dir}")
-        except OSError as e:
-            logger.error(f"Could not create output directory '{output_dir}': {e}")
-            # No sys.exit here, main will handle based on return or an exception
-            raise  # Re-raise the exception to be caught by main or stop execution
+    """Downloads MP3s, applies metadata, using Python's logging.
+
+    max_workers is the number of URLs downloaded concurrently, and
+    concurrent_fragments the number of fragments fetched in parallel within one
+    DASH/HLS download. If force is True, items that were already downloaded are
+    downloaded again.
+    """
+    from yt_dlp.utils import make_archive_id
+
+    # Just try to create it: one syscall instead of an exists() check first
+    try:
+        os.makedirs(output_dir)
+        logger.info(f"Created output directory: {output_dir}")
+    except FileExistsError:
+        pass
+    except OSError as e:
+        logger.error(f"Could not create output directory '{output_dir}': {e}")
+        # No sys.exit here, main will handle based on return or an exception
+        raise  # Re-raise the exception to be caught by main or stop execution
 
     # yt-dlp options
     # If logger is set to INFO or higher, make yt-dlp quieter.
     # If logger is DEBUG, let yt-dlp be verbose.
     ydl_quiet_mode = not logger.isEnabledFor(logging.DEBUG)
 
+    archive_path = os.path.join(output_dir, DOWNLOAD_ARCHIVE_NAME)
+    skip_existing = SKIP_EXISTING_DOWNLOADS and not force
+    archive = load_download_archive(archive_path) if skip_existing else set()
+    # Set when the run is interrupted (Ctrl-C)
+    stop = threading.Event()
+
     ydl_opts_base = {
-        "format": "bestaudio/best",
-        "postprocessors": [
-            {
-                "key": "FFmpegExtractAudio",
-                "preferredcodec": "mp3",
-                "preferredquality": "192",
-            }
-        ],
-        "outtmpl": {"default": os.path.join(output_dir, "%(title)s.%(ext)s")},
+        "format": (
+            "bestaudio[ext=m4a]/bestaudio[acodec^=mp4a]/bestaudio/best"
+            if KEEP_NATIVE_CODEC
+            else "bestaudio/best"
+        ),
+        # MP3 conversion runs in our own postprocess stage, not inside yt-dlp,
+        # so the next download can start while ffmpeg is still encoding.
+        # In KEEP_NATIVE_CODEC mode yt-dlp only remuxes (no re-encoding) MP4/AAC
+        # sources to .m4a; M4A cannot hold other codecs such as Opus from WebM.
+        "postprocessors": (
+            [{"key": "FFmpegVideoRemuxer", "preferedformat": "mp4>m4a/aac>m4a"}]
+            if KEEP_NATIVE_CODEC
+            else []
+        ),
+        # The video ID in the name lets re-runs detect finished downloads
+        "outtmpl": {"default": os.path.join(output_dir, "%(title)s [%(id)s].%(ext)s")},
         "noplaylist": True,
+        "concurrent_fragment_downloads": concurrent_fragments,
+        "http_chunk_size": HTTP_CHUNK_SIZE,
         "quiet": ydl_quiet_mode,  # Control yt-dlp's verbosity based on our log level
         "ignoreerrors": "only_download",
-        "writethumbnail": False,
+        # Let yt-dlp save the thumbnail so the cover art is not downloaded twice
+        "writethumbnail": True,
+        # Lets Ctrl-C abort the downloads that are already running
+        "progress_hooks": [functools.partial(_cancel_if_stopped, stop)],
         "logger": logger
         if logger.isEnabledFor(logging.DEBUG)
         else None,  # Pass our logger to yt-dlp for its messages IF we are in DEBUG
     }
+    if skip_existing:
+        # Given a set (not a file name), yt-dlp skips archived items of any site
+        # but leaves writing the archive file to record_download()
+        ydl_opts_base["download_archive"] = archive
+        # Report such a skip as an exception instead of returning no file
+        ydl_opts_base["break_on_existing"] = True
+
+    concurrency = None
+    if ADAPTIVE_CONCURRENCY and max_workers > 1:
+        concurrency = AdaptiveConcurrency(
+            load_concurrency_state(max_workers), max_workers
+        )
+        ydl_opts_base["progress_hooks"].append(concurrency.progress_hook)
+        # Needed to notice HTTP 429/403 errors; verbosity is still set by our log level
+        ydl_opts_base["logger"] = _YtdlpLogger(concurrency)
+        logger.debug(
+            "Adaptive concurrency: starting with %s of up to %s downloads.",
+            concurrency.limit,
+            max_workers,
+        )
 
-    download_count = 0
     total_urls = len(urls)
 
     logger.info(f"Starting download process for {total_urls} URL(s)...")
     logger.info(f"Output directory: {os.path.abspath(output_dir)}")
 
-    for i, url in enumerate(urls, 1):
-        # Custom INFO log for progress
-        logger.info(f"[{i}/{total_urls}] Processing URL: {url}")
+    # Resolve the renaming settings once instead of branching on them per file
+    if PERFORM_CUSTOM_RENAMING:
+        logger.debug(
+            "Custom renaming with sanitize_filename(restricted=%s)",
+            SANITIZE_WITH_RESTRICTED_MODE,
+        )
+        sanitize_title = functools.partial(
+            sanitize_filename_cached, restricted=SANITIZE_WITH_RESTRICTED_MODE
+        )
+    else:
+        sanitize_title = None
 
-        final_info_dict = None
+    # One listing of the output directory serves the skip check and the renaming
+    existing_names = list_file_names(output_dir)
+    downloaded_ids = scan_downloaded_ids(existing_names) if skip_existing else set()
+    taken_names = {name.casefold() for name in existing_names}
+    pending_urls = []
+    skipped_count = 0
+    for i, url in enumerate(urls, 1):
+        video_id = extract_video_id(url)
+        if video_id and (
+            video_id in downloaded_ids
+            or make_archive_id("Youtube", video_id) in archive
+        ):
+            logger.info(f"[{i}/{total_urls}] Already downloaded, skipping: {url}")
+            skipped_count += 1
+        else:
+            pending_urls.append((i, url))
+    logger.debug(
+        "Processing with up to %s download and %s conversion worker(s).",
+        max_workers,
+        CONVERT_WORKERS,
+    )
 
+    # Downloads (network-bound) and conversions (CPU-bound) run in separate pools:
+    # each finished download is handed straight to the conversion pool, and its
+    # thumbnail (when tagged with mutagen) is fetched meanwhile in a third pool.
+    # Each download thread sets up one YoutubeDL instance and reuses it for
+    # every URL it handles, instead of paying the setup cost per URL.
+    # convert_slots bounds how many downloaded files wait for conversion. A
+    # download takes its slot before it starts, so the running downloads get
+    # max_workers slots on top of the CONVERT_QUEUE_SIZE waiting files.
+    ydl_instances = []
+    convert_slots = threading.Semaphore(max_workers + CONVERT_QUEUE_SIZE)
+    with (
+        ThreadPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_download_worker,
+            initargs=(ydl_opts_base, ydl_instances),
+        ) as download_pool,
+        ThreadPoolExecutor(max_workers=CONVERT_WORKERS) as convert_pool,
+        ThreadPoolExecutor(max_workers=max_workers) as thumbnail_pool,
+    ):
+        download_futures = {
+            download_pool.submit(
+                _download_audio, url, i, total_urls, convert_slots, stop, concurrency
+            ): url
+            for i, url in pending_urls
+        }
+        convert_futures = []
         try:
-            current_ydl_opts = ydl_opts_base.copy()
-            with yt_dlp.YoutubeDL(current_ydl_opts) as ydl:
-                logger.debug(f"  Extracting info and downloading for URL: {url}")
-                final_info_dict = ydl.extract_info(url, download=True)
-
-                if final_info_dict:
-                    downloaded_mp3_path = final_info_dict.get("filepath")
-                    if (
-                        not downloaded_mp3_path
-                        or not downloaded_mp3_path.lower().endswith(".mp3")
-                    ):
-                        if final_info_dict.get("requested_downloads"):
-                            for dl_info in final_info_dict["requested_downloads"]:
-                                if dl_info.get("filepath") and dl_info[
-                                    "filepath"
-                                ].lower().endswith(".mp3"):
-                                    downloaded_mp3_path = dl_info["filepath"]
-                                    logger.debug(
-                                        f"  Found MP3 path in requested_downloads: {downloaded_mp3_path}"
-                                    )
-                                    break
-
-                    if (
-                        downloaded_mp3_path
-                        and os.path.exists(downloaded_mp3_path)
-                        and downloaded_mp3_path.lower().endswith(".mp3")
-                    ):
-                        logger.info(
-                            f"  Download and conversion successful. Final file: '{os.path.basename(downloaded_mp3_path)}'"
-                        )
-                        download_count += 1
-
-                        title_for_metadata = (
-                            final_info_dict.get("track")
-                            or final_info_dict.get("title", "Unknown Title")
-                        ).strip() or "Unknown Title"
-                        artist_for_metadata = (
-                            final_info_dict.get("artist")
-                            or final_info_dict.get("uploader", "Unknown Artist")
-                        ).strip() or "Unknown Artist"
-                        thumbnail_url = final_info_dict.get("thumbnail")
-                        logger.debug(
-                            f"  Metadata extracted: Title='{title_for_metadata}', Artist='{artist_for_metadata}', Thumbnail='{thumbnail_url is not None}'"
-                        )
-
-                        final_path_for_metadata = downloaded_mp3_path
-                        if PERFORM_CUSTOM_RENAMING:
-                            logger.debug(
-                                f"  Attempting custom renaming for: {os.path.basename(downloaded_mp3_path)}"
-                            )
-                            # Apply sanitization based on SANITIZE_WITH_RESTRICTED_MODE
-                            if SANITIZE_WITH_RESTRICTED_MODE:
-                                logger.debug(
-                                    "    Using sanitize_filename with restricted=True"
-                                )
-                                desired_filename_base = ydlp_sanitize_filename(
-                                    title_for_metadata, restricted=True
-                                )
-                            else:
-                                logger.debug(
-                                    "    Using sanitize_filename with restricted=False"
-                                )
-                                desired_filename_base = ydlp_sanitize_filename(
-                                    title_for_metadata, restricted=False
-                                )
-
-                            desired_filename_mp3 = f"{desired_filename_base}.mp3"
-                            desired_filepath_mp3 = os.path.join(
-                                os.path.dirname(downloaded_mp3_path),
-                                desired_filename_mp3,
-                            )
-
-                            if downloaded_mp3_path != desired_filepath_mp3:
-                                if os.path.exists(desired_filepath_mp3):
-                                    logger.warning(
-                                        f"  (Rename): Target file '{desired_filename_mp3}' already exists. Not renaming."
-                                    )
-                                else:
-                                    try:
-                                        logger.info(
-                                            f"  Renaming '{os.path.basename(downloaded_mp3_path)}' to '{desired_filename_mp3}'"
-                                        )
-                                        shutil.move(
-                                            downloaded_mp3_path, desired_filepath_mp3
-                                        )
-                                        final_path_for_metadata = desired_filepath_mp3
-                                    except OSError as e_rename:
-                                        logger.error(
-                                            f"  (Rename): Could not rename file: {e_rename}."
-                                        )
-                        else:
-                            logger.debug(
-                                f"  Skipping custom renaming. Using filename from yt-dlp: '{os.path.basename(downloaded_mp3_path)}'"
-                            )
-
-                        apply_metadata_and_cover(
-                            final_path_for_metadata,
-                            title_for_metadata,
-                            artist_for_metadata,
-                            thumbnail_url,
-                        )
-                    else:
-                        logger.error(
-                            f"  Could not reliably locate the final MP3 file path from yt-dlp's output for URL {url}."
-                        )
-                        if downloaded_mp3_path:
-                            logger.debug(
-                                f"    Last known path: '{downloaded_mp3_path}', Exists: {os.path.exists(downloaded_mp3_path)}"
-                            )
-                        logger.debug(
-                            f"    Final info dict from yt-dlp was: filepath='{final_info_dict.get('filepath', 'N/A')}', "
-                            f"requested_downloads='{final_info_dict.get('requested_downloads', 'N/A')}'"
-                        )
-                else:
-                    logger.warning(
-                        f"  yt-dlp's extract_info (with download) did not return sufficient information for {url}."
+            for future in as_completed(download_futures):
+                info_dict = future.result()
+                if info_dict:
+                    cover_future = _prefetch_cover(info_dict, thumbnail_pool)
+                    convert_future = convert_pool.submit(
+                        _convert_and_tag,
+                        download_futures[future],
+                        info_dict,
+                        cover_future,
+                        archive_path,
+                        sanitize_title,
+                        taken_names,
                     )
+                    convert_future.add_done_callback(lambda _: convert_slots.release())
+                    convert_futures.append(convert_future)
+                elif info_dict is not None:
+                    skipped_count += 1
+        except BaseException:
+            # Interrupted (Ctrl-C): drop the queued work and abort the running
+            # downloads, so leaving the with-block only waits for conversions
+            # that are already running. Finished downloads are no longer handed
+            # off, so their slots are never released; instead every download
+            # thread waiting for a slot (or for the concurrency limit) is woken
+            # up and returns at once.
+            stop.set()
+            for pool in (download_pool, convert_pool, thumbnail_pool):
+                pool.shutdown(wait=False, cancel_futures=True)
+            convert_slots.release(max_workers)
+            if concurrency is not None:
+                concurrency.cancel()
+            raise
+        download_count = sum(1 for future in convert_futures if future.result())
 
-        except yt_dlp.utils.DownloadError as e_dl:
-            logger.error(f"  DownloadError during processing {url}: {e_dl}")
-        except Exception as e:
-            logger.error(
-                f"  An unexpected error occurred while processing {url}: {e}",
-                exc_info=True if logger.isEnabledFor(logging.DEBUG) else False,
-            )
+    for ydl in ydl_instances:
+        ydl.close()
+    if concurrency is not None:
+        concurrency.close()
+        save_concurrency_state(concurrency.limit)
 
     logger.info("\n--- Download Process Finished ---")  # Add newline for separation
     if download_count > 0:
@@ -398,6 +1472,8 @@ def download_mp3_from_urls(
         )
     else:
         logger.info("No items were successfully downloaded or processed.")
+    if skipped_count > 0:
+        logger.info(f"Skipped {skipped_count} item(s) that were already downloaded.")
     logger.info(f"Files are located in: {os.path.abspath(output_dir)}")
 
 
@@ -416,7 +1492,51 @@ if __name__ == "__main__":
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
         help="Set the logging level (default: INFO).",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=MAX_WORKERS,
+        metavar="N",
+        help=f"Number of URLs to download concurrently (default: {MAX_WORKERS}).",
+    )
+    parser.add_argument(
+        "--concurrent-fragments",
+        type=int,
+        default=CONCURRENT_FRAGMENT_DOWNLOADS,
+        metavar="N",
+        help="Number of fragments of a DASH/HLS stream downloaded in parallel "
+        f"(default: {CONCURRENT_FRAGMENT_DOWNLOADS}).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Download every URL again, even if it was already downloaded.",
+    )
+    parser.add_argument(
+        "--cover-max-dim",
+        type=int,
+        default=COVER_MAX_SIZE,
+        metavar="PIXELS",
+        help="Maximum width/height of re-encoded cover art "
+        f"(default: {COVER_MAX_SIZE}, same as COVER_MAX_SIZE).",
+    )
+    parser.add_argument(
+        "--transcode-thumbnail-to-jpeg",
+        action="store_true",
+        help="When tagging with mutagen, re-encode WebP cover art to JPEG for players "
+        "that cannot show WebP (same as setting CONVERT_WEBP_TO_JPEG = True; "
+        "ffmpeg always stores JPEG/PNG).",
+    )
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.concurrent_fragments < 1:
+        parser.error("--concurrent-fragments must be at least 1")
+    if args.cover_max_dim < 1:
+        parser.error("--cover-max-dim must be at least 1")
+    COVER_MAX_SIZE = args.cover_max_dim
+    if args.transcode_thumbnail_to_jpeg:
+        CONVERT_WEBP_TO_JPEG = True
 
     # Setup logging based on command-line argument or default
     setup_logging(args.loglevel)
@@ -427,7 +1547,13 @@ if __name__ == "__main__":
 
     if urls_to_download:
         try:
-            download_mp3_from_urls(urls_to_download, OUTPUT_DIRECTORY_NAME)
+            download_mp3_from_urls(
+                urls_to_download,
+                OUTPUT_DIRECTORY_NAME,
+                max_workers=args.jobs,
+                force=args.force,
+                concurrent_fragments=args.concurrent_fragments,
+            )
         except Exception as e:
             logger.critical(
                 f"A critical error occurred in download_mp3_from_urls: {e}",